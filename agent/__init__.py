@@ -1 +1,61 @@
 # Agentic Game-Builder AI — Agent Package
+
+from __future__ import annotations
+
+import functools
+import os
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+# Extra request options passed to Ollama / llama.cpp on every completion:
+# reuse the KV cache for the unchanged prompt prefix (the system prompt) and
+# keep the model loaded between phases instead of reloading it.
+OLLAMA_OPTIONS = {"cache_prompt": True, "keep_alive": "10m"}
+
+
+async def warm_cache(client: AsyncOpenAI, model: str, messages: list[dict]) -> None:
+    """
+    Have the backend prefill `messages` without generating a reply.
+
+    Sends a max_tokens=1 request with cache_prompt enabled, so a later
+    request that starts with the same messages skips their prefill.
+    Warming is best effort: errors are swallowed.
+    """
+    try:
+        await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=1,
+            extra_body=OLLAMA_OPTIONS,
+        )
+    except Exception:
+        pass  # a cold cache only costs the prefill we tried to hide
+
+
+_PROMPTS_DIR = os.path.join(os.path.dirname(__file__), "..", "prompts")
+
+
+@functools.lru_cache(maxsize=None)
+def load_prompt(name: str) -> str:
+    """
+    Return the system prompt stored in prompts/<name>.
+
+    Installed copies read it from prompts/_compiled.py, which
+    compile_prompts.py generates from the .txt files. An entry is only used
+    while the .txt file's modification time still matches the one recorded
+    at compile time, so an edited prompt is never shadowed by a stale copy.
+    Otherwise (or without the module) the .txt file is read directly.
+    """
+    path = os.path.join(_PROMPTS_DIR, name)
+    try:
+        from prompts._compiled import PROMPTS
+
+        mtime_ns, text = PROMPTS[name]
+        if os.stat(path).st_mtime_ns == mtime_ns:
+            return text
+    except (ImportError, KeyError, OSError):
+        pass
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().strip()
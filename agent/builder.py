@@ -6,37 +6,64 @@ Takes a structured game plan and generates three files:
   - style.css
   - game.js
 
+Each file is generated by its own request with a focused system prompt,
+and the three requests run concurrently. If any of them comes back empty
+or incomplete, the builder falls back to a single streamed request that
+produces all three files between ===FILE: ... ===END FILE=== delimiters.
+
 Writes them to the output/ directory.
 """
 
+from __future__ import annotations
+
+import asyncio
 import json
 import os
-import re
-from openai import OpenAI
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+from agent import OLLAMA_OPTIONS, load_prompt, warm_cache
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-# Regex to match ===FILE: <name>=== ... ===END FILE===
-_FILE_PATTERN = re.compile(
-    r"===FILE:\s*(.+?)===\s*\n(.*?)===END FILE===",
-    re.DOTALL,
-)
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
 
-def _load_system_prompt() -> str:
-    """Load the builder system prompt from the prompts/ directory."""
-    prompt_path = os.path.join(
-        os.path.dirname(__file__), "..", "prompts", "builder_prompt.txt"
-    )
-    with open(prompt_path, "r", encoding="utf-8") as f:
-        return f.read().strip()
+# Delimiters the builder prompt asks the LLM to wrap each file in
+_FILE_START = "===FILE:"
+_FILE_END = "===END FILE==="
+
+# Files every generated game must contain, with the prompt that generates each
+_FILE_PROMPTS = {
+    "index.html": "builder_html_prompt.txt",
+    "style.css": "builder_css_prompt.txt",
+    "game.js": "builder_js_prompt.txt",
+}
+_EXPECTED_FILES = set(_FILE_PROMPTS)
+
+# Output token budget per generated file: floor, per plan item, and ceiling
+_MIN_OUTPUT_TOKENS = 2048
+_TOKENS_PER_PLAN_ITEM = 256
+_MAX_OUTPUT_TOKENS = 8192
 
 
-def run(client: OpenAI, model: str, plan: dict, output_dir: str) -> list[str]:
+def _load_system_prompt(name: str = "builder_prompt.txt") -> str:
+    """Load a builder system prompt from the prompts/ directory."""
+    return load_prompt(name)
+
+
+async def arun(
+    client: AsyncOpenAI, model: str, plan: dict, output_dir: str
+) -> list[str]:
     """
     Generate game files from the structured plan.
 
     Args:
-        client:     An initialised OpenAI client.
+        client:     An initialised AsyncOpenAI client.
         model:      The model name to use.
         plan:       The structured game plan dict from Phase 2.
         output_dir: Directory to write the generated files to.
@@ -44,45 +71,289 @@ def run(client: OpenAI, model: str, plan: dict, output_dir: str) -> list[str]:
     Returns:
         A list of file paths that were created.
     """
-    system_prompt = _load_system_prompt()
+    parts = [
+        "\n",
+        "=" * 60 + "\n",
+        "PHASE 3 — CODE GENERATION\n",
+        "=" * 60 + "\n",
+        "Generating game files...\n\n",
+    ]
+    sys.stdout.write("".join(parts))
+
+    plan_json = _dump_plan(plan)
+    max_tokens = _token_budget(plan)
+
+    # Ensure output directory exists
+    os.makedirs(output_dir, exist_ok=True)
+
+    # One focused request per file, all in flight at once
+    contents = await asyncio.gather(
+        *(
+            _gen_file(client, model, _load_system_prompt(prompt), plan_json, max_tokens)
+            for prompt in _FILE_PROMPTS.values()
+        )
+    )
+    files = dict(zip(_FILE_PROMPTS, contents))
+
+    if all(files.values()):
+        created = await _write_files(output_dir, files)
+    else:
+        print("   ⚠️  A file came back incomplete — regenerating all files in one request...\n")
+        combined_max_tokens = min(_MAX_OUTPUT_TOKENS, max_tokens * len(_FILE_PROMPTS))
+        created = await _build_combined(
+            client, model, plan_json, output_dir, combined_max_tokens
+        )
+
+    # Report all files in one write; live per-file progress is only shown
+    # by the streaming fallback, and only on an interactive terminal
+    parts = [f"   ✅  Written: {os.path.basename(path)}\n" for path in created]
+    parts.append(f"\n🎮  Game files generated in: {output_dir}\n")
+    sys.stdout.write("".join(parts))
+    return created
+
+
+def _token_budget(plan: dict) -> int:
+    """
+    Pick max_tokens for one generated file from the size of the plan.
+
+    Each mechanic, entity, key or other list/dict item in the plan gets
+    _TOKENS_PER_PLAN_ITEM tokens, clamped between _MIN_OUTPUT_TOKENS and
+    _MAX_OUTPUT_TOKENS. A tight budget lets servers that reserve KV cache
+    for max_tokens up front (e.g. vLLM) allocate less, but a budget that
+    is too small truncates the file mid-code, so the floor stays generous.
+    """
+    items = sum(len(value) for value in plan.values() if isinstance(value, (list, dict)))
+    return min(_MAX_OUTPUT_TOKENS, max(_MIN_OUTPUT_TOKENS, _TOKENS_PER_PLAN_ITEM * items))
+
+
+def _dump_plan(plan: dict) -> str:
+    """Serialise the plan as indented JSON, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(plan, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(plan, indent=2)
+
+
+async def awarm(client: AsyncOpenAI, model: str) -> None:
+    """
+    Prefill the per-file system prompts on the backend ahead of arun().
 
-    print("\n" + "=" * 60)
-    print("PHASE 3 — CODE GENERATION")
-    print("=" * 60)
-    print("Generating game files...\n")
+    Each prompt is sent on its own with max_tokens=1; with cache_prompt
+    enabled the backend keeps the computed prefix, so the real requests
+    only have to prefill the plan. Warming is best effort and never fails.
+    """
+    await asyncio.gather(
+        *(
+            warm_cache(client, model, [{"role": "system", "content": system_prompt}])
+            for system_prompt in map(_load_system_prompt, _FILE_PROMPTS.values())
+        )
+    )
 
-    plan_json = json.dumps(plan, indent=2)
 
-    response = client.chat.completions.create(
+async def _gen_file(
+    client: AsyncOpenAI, model: str, system_prompt: str, plan_json: str, max_tokens: int
+) -> str:
+    """
+    Generate a single file from the plan and return its contents.
+
+    Returns an empty string when the file is incomplete (cut off by the
+    token budget, or an unclosed code fence), so arun() falls back to the
+    combined request instead of writing a truncated file.
+    """
+    response = await client.chat.completions.create(
         model=model,
         messages=[
             {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"Here is the game plan:\n\n{plan_json}"},
+        ],
+        temperature=0.3,
+        max_tokens=max_tokens,
+        extra_body=OLLAMA_OPTIONS,
+    )
+    choice = response.choices[0]
+    if choice.finish_reason == "length":
+        return ""
+    return _strip_fences(choice.message.content or "")
+
+
+def _strip_fences(text: str) -> str:
+    """
+    Extract the file from markdown code fences the LLM may wrap it in,
+    dropping any prose around them. Text without fences is used as-is.
+    """
+    cleaned = text.strip()
+    start = cleaned.find("```")
+    if start != -1:
+        body_start = cleaned.find("\n", start)  # skip the ```lang line
+        end = cleaned.rfind("```")
+        if body_start == -1 or end <= body_start:
+            return ""  # unclosed fence — treat the file as incomplete
+        cleaned = cleaned[body_start + 1 : end].strip()
+    return cleaned + "\n" if cleaned else ""
+
+
+async def _build_combined(
+    client: AsyncOpenAI, model: str, plan_json: str, output_dir: str, max_tokens: int
+) -> list[str]:
+    """
+    Generate all three files in one streamed request using the
+    ===FILE: name=== ... ===END FILE=== format, writing each file as it arrives.
+    """
+    stream = await client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": _load_system_prompt()},
             {
                 "role": "user",
                 "content": f"Here is the game plan. Generate the three files:\n\n{plan_json}",
             },
         ],
         temperature=0.3,
-        max_tokens=4096,
+        max_tokens=max_tokens,
+        stream=True,
+        extra_body=OLLAMA_OPTIONS,
     )
 
-    raw = response.choices[0].message.content.strip()
+    # Write each file to disk as its tokens arrive
+    writer = _StreamingFileWriter(output_dir)
+    chunks = []
+    try:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                chunks.append(delta)
+                writer.feed(delta)
+    finally:
+        writer.close()
 
-    # Parse the three files from the response
-    files = _parse_files(raw)
+    if _EXPECTED_FILES <= writer.written.keys():
+        return list(writer.written.values())
 
-    # Ensure output directory exists
-    os.makedirs(output_dir, exist_ok=True)
+    # Streaming split failed — re-parse the complete response, which reports
+    # exactly which files are missing
+    files = _parse_files("".join(chunks).strip())
+    return await _write_files(output_dir, files)
+
+
+class _StreamingFileWriter:
+    """
+    Split a streamed LLM response into files while it is being generated.
+
+    A small IDLE → IN_FILE state machine scans the rolling buffer for the
+    ===FILE: / ===END FILE=== delimiters with str.find. File bodies are
+    written to <name>.part as soon as they arrive; only a possible partial
+    delimiter and trailing whitespace are held back, so the written files
+    match the stripped output of _parse_files. A file is moved into place
+    only once its ===END FILE=== arrives, so a truncated response never
+    replaces an existing file with half of a new one.
+    """
 
-    created = []
-    for filename, content in files.items():
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.written: dict[str, str] = {}  # filename -> path, completed files only
+        self._buffer = ""
+        self._file = None  # open handle on the .part file while IN_FILE
+        self._name = ""
+        self._path = ""
+        self._part_path = ""
+        self._body_started = False
+
+    def feed(self, chunk: str) -> None:
+        """Consume the next chunk of streamed text."""
+        self._buffer += chunk
+        progressed = True
+        while progressed:
+            if self._file is None:
+                progressed = self._open_next()
+            else:
+                progressed = self._write_body()
+
+    def close(self) -> None:
+        """Discard the .part file of a file left unfinished by a truncated response."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            try:
+                os.remove(self._part_path)
+            except OSError:
+                pass
+
+    def _open_next(self) -> bool:
+        """IDLE: look for the next file header. Returns True on a state change."""
+        start = self._buffer.find(_FILE_START)
+        if start == -1:
+            # Keep just enough text to match a delimiter split across chunks
+            self._buffer = self._buffer[-(len(_FILE_START) - 1) :]
+            return False
+
+        name_end = self._buffer.find("===", start + len(_FILE_START))
+        newline = self._buffer.find("\n", name_end) if name_end != -1 else -1
+        if newline == -1:
+            # Header not complete yet
+            self._buffer = self._buffer[start:]
+            return False
+
+        self._name = self._buffer[start + len(_FILE_START) : name_end].strip()
+        self._path = os.path.join(self.output_dir, self._name)
+        self._part_path = self._path + ".part"
+        self._file = open(self._part_path, "w", encoding="utf-8")
+        self._body_started = False
+        self._buffer = self._buffer[newline + 1 :]
+        return True
+
+    def _write_body(self) -> bool:
+        """IN_FILE: write the body until ===END FILE===. Returns True on a state change."""
+        if not self._body_started:
+            self._buffer = self._buffer.lstrip()
+            if not self._buffer:
+                return False
+            self._body_started = True
+
+        end = self._buffer.find(_FILE_END)
+        if end != -1:
+            self._file.write(self._buffer[:end].rstrip() + "\n")
+            self._file.close()
+            self._file = None
+            os.replace(self._part_path, self._path)
+            self.written[self._name] = self._path
+            if sys.stdout.isatty():
+                print(f"   ⏳  Finished streaming: {self._name}")
+            self._buffer = self._buffer[end + len(_FILE_END) :]
+            return True
+
+        # Anything that could be the start of the delimiter, and the whitespace
+        # right before it, waits for the next chunk
+        limit = max(0, len(self._buffer) - (len(_FILE_END) - 1))
+        safe = len(self._buffer[:limit].rstrip())
+        if safe > 0:
+            self._file.write(self._buffer[:safe])
+            self._buffer = self._buffer[safe:]
+        return False
+
+
+async def _write_files(output_dir: str, files: dict[str, str]) -> list[str]:
+    """
+    Write all generated files concurrently and return their paths.
+
+    Each file gets its own worker thread, so slow writes (cold disks,
+    network mounts, on-access virus scanners) overlap instead of queueing.
+    """
+
+    def _write(filename: str, content: str) -> str:
         filepath = os.path.join(output_dir, filename)
         with open(filepath, "w", encoding="utf-8") as f:
             f.write(content)
-        created.append(filepath)
-        print(f"   ✅  Written: {filename}")
+        return filepath
 
-    print(f"\n🎮  Game files generated in: {output_dir}")
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=len(files)) as executor:
+        created = await asyncio.gather(
+            *(
+                loop.run_in_executor(executor, _write, filename, content)
+                for filename, content in files.items()
+            )
+        )
     return created
 
 
@@ -91,22 +362,31 @@ def _parse_files(text: str) -> dict[str, str]:
     Extract file contents from the LLM response using the
     ===FILE: name=== ... ===END FILE=== delimiters.
     """
-    matches = _FILE_PATTERN.findall(text)
+    files = {}
+    i = 0
+    # Single left-to-right scan with str.find; each block is
+    # ===FILE: <name>===<newline><body>===END FILE===
+    while True:
+        start = text.find(_FILE_START, i)
+        if start == -1:
+            break
+        name_end = text.find("===", start + len(_FILE_START))
+        newline = text.find("\n", name_end) if name_end != -1 else -1
+        end = text.find(_FILE_END, newline) if newline != -1 else -1
+        if end == -1:
+            break  # incomplete or unterminated block
+        filename = text[start + len(_FILE_START) : name_end].strip()
+        files[filename] = text[newline + 1 : end].strip() + "\n"
+        i = end + len(_FILE_END)
 
-    if not matches:
+    if not files:
         raise ValueError(
             "Could not parse file blocks from LLM response.\n"
             "Expected format: ===FILE: filename=== ... ===END FILE==="
         )
 
-    files = {}
-    for name, content in matches:
-        filename = name.strip()
-        files[filename] = content.strip() + "\n"
-
     # Verify we got all three expected files
-    expected = {"index.html", "style.css", "game.js"}
-    missing = expected - set(files.keys())
+    missing = _EXPECTED_FILES - set(files.keys())
     if missing:
         raise ValueError(f"Missing expected files in LLM output: {missing}")
 
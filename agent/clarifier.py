@@ -4,36 +4,69 @@ Phase 1 — Clarifier Agent
 Asks the user clarifying questions about their game idea.
 Loops until the LLM decides the requirements are clear.
 Returns a consolidated requirements summary.
+
+The planner prompt is appended to the clarifier prompt so that the final
+"ready" turn also carries the structured game plan, saving the separate
+planning round-trip whenever the model follows the fused format.
 """
 
-import os
-from openai import OpenAI
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+from typing import TYPE_CHECKING
+from agent import OLLAMA_OPTIONS, load_prompt, planner, warm_cache
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
 
 # Sentinel the LLM uses to signal "requirements are clear"
 _READY_TAG = "REQUIREMENTS_CLEAR"
 
+# The prompt makes the tag the first line of a ready reply, so only the start
+# of a reply is searched; a mention deeper in a normal turn is not a signal
+_READY_WINDOW = 200
+
+# Delimiters around the game plan emitted alongside the summary
+_PLAN_START = "===PLAN==="
+_PLAN_END = "===END PLAN==="
+
+# Questions are short, but the final turn also carries the full plan JSON
+_MAX_TOKENS = 1536
+
+# Once the conversation after the system prompt grows past this many tokens
+# (estimated at ~4 characters per token), older turns are summarised
+_HISTORY_TOKEN_LIMIT = 1500
+_CHARS_PER_TOKEN = 4
 
+
+@functools.lru_cache(maxsize=1)
 def _load_system_prompt() -> str:
-    """Load the clarifier system prompt from the prompts/ directory."""
-    prompt_path = os.path.join(
-        os.path.dirname(__file__), "..", "prompts", "clarifier_prompt.txt"
+    """Load the clarifier prompt with the planner prompt appended to it."""
+    return (
+        load_prompt("clarifier_prompt.txt")
+        + "\n\nPLANNER INSTRUCTIONS:\n"
+        + load_prompt("planner_prompt.txt")
     )
-    with open(prompt_path, "r", encoding="utf-8") as f:
-        return f.read().strip()
 
 
-def run(client: OpenAI, model: str, game_idea: str) -> str:
+async def arun(
+    client: AsyncOpenAI, model: str, game_idea: str
+) -> tuple[str, dict | None]:
     """
     Run the clarification loop.
 
     Args:
-        client:    An initialised OpenAI client.
+        client:    An initialised AsyncOpenAI client.
         model:     The model name to use.
         game_idea: The user's raw game idea in natural language.
 
     Returns:
-        A consolidated string summarising the clarified requirements.
+        A (summary, plan) tuple. The summary consolidates the clarified
+        requirements; the plan is the structured game plan dict, or None
+        if the final turn did not contain a usable plan block.
     """
     system_prompt = _load_system_prompt()
 
@@ -50,38 +83,186 @@ def run(client: OpenAI, model: str, game_idea: str) -> str:
 
     while True:
         # Ask the LLM for questions (or a "ready" signal)
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model=model,
             messages=messages,
             temperature=0.7,
+            top_p=0.9,
+            max_tokens=_MAX_TOKENS,
+            extra_body=OLLAMA_OPTIONS,
         )
         assistant_msg = response.choices[0].message.content.strip()
 
         # Check if the LLM signals that requirements are clear
-        if _READY_TAG in assistant_msg:
-            # Extract the summary between <summary> tags
-            summary = _extract_summary(assistant_msg)
+        if _is_ready(assistant_msg):
+            # Extract the summary (and the fused plan, if present)
+            summary, plan = _extract_summary(assistant_msg)
             print("\n✅  Requirements are clear!")
             print(f"\n📋  Summary:\n{summary}\n")
-            return summary
+            return summary, plan
 
         # Otherwise, show the questions and get user answers
         print(f"🤖  Agent:\n{assistant_msg}\n")
         messages.append({"role": "assistant", "content": assistant_msg})
 
-        user_answer = input("👤  Your answer: ").strip()
+        # Once the history is long, summarise the turns before this question
+        # while the user types; they are already final
+        summary_task = None
+        if len(messages) > 3 and _estimate_tokens(messages[1:]) > _HISTORY_TOKEN_LIMIT:
+            summary_task = asyncio.create_task(
+                _summarise_turns(client, model, messages[1:-1])
+            )
+
+        # Let the backend prefill the next prompt while the user types
+        warmup = asyncio.create_task(_warm_next_turn(client, model, messages, summary_task))
+        user_answer = (await _read_line("👤  Your answer: ")).strip()
+        if not warmup.done():
+            warmup.cancel()  # don't make the real request queue behind it
+        if summary_task is not None:
+            history_summary = await summary_task
+            if history_summary:
+                messages = _with_summary(messages, history_summary)
         if not user_answer:
             user_answer = "No preference, use your best judgment."
         messages.append({"role": "user", "content": user_answer})
         print()
 
 
-def _extract_summary(text: str) -> str:
-    """Pull the summary from between <summary>...</summary> tags."""
+async def _read_line(prompt: str) -> str:
+    """
+    Read a line from stdin without blocking the event loop.
+
+    input() runs on a daemon thread rather than through asyncio.to_thread:
+    an executor thread stuck in input() is joined on shutdown, so Ctrl-C
+    would not exit until another line arrived on stdin.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def _resolve(line: str | None, error: Exception | None) -> None:
+        if future.done():
+            return  # the wait was cancelled (e.g. Ctrl-C)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(line)
+
+    def _reader() -> None:
+        try:
+            line, error = input(prompt), None
+        except Exception as e:  # e.g. EOFError when stdin is closed
+            line, error = None, e
+        try:
+            loop.call_soon_threadsafe(_resolve, line, error)
+        except RuntimeError:
+            pass  # the event loop has already shut down
+
+    threading.Thread(target=_reader, daemon=True).start()
+    return await future
+
+
+def _is_ready(text: str) -> bool:
+    """Check whether a reply signals that the requirements are clear."""
+    return text.find(_READY_TAG, 0, _READY_WINDOW) != -1
+
+
+def _estimate_tokens(messages: list[dict]) -> int:
+    """Rough token count of the given messages (~4 characters per token)."""
+    return sum(len(message["content"]) for message in messages) // _CHARS_PER_TOKEN
+
+
+async def _warm_next_turn(
+    client: AsyncOpenAI,
+    model: str,
+    messages: list[dict],
+    summary_task: asyncio.Task[str] | None,
+) -> None:
+    """
+    Prefill the prompt the next turn will send, ahead of the user's answer.
+
+    When older turns are being summarised, waits for the summary and warms
+    the compressed history that will actually be sent. The placeholder
+    user turn makes the backend render the last assistant message in full.
+    """
+    if summary_task is not None:
+        # Shielded, so cancelling the warm-up leaves the summary running
+        summary = await asyncio.shield(summary_task)
+        if summary:
+            messages = _with_summary(messages, summary)
+    await warm_cache(client, model, messages + [{"role": "user", "content": " "}])
+
+
+async def _summarise_turns(
+    client: AsyncOpenAI, model: str, turns: list[dict]
+) -> str:
+    """
+    Condense earlier question/answer turns into a short summary.
+
+    Returns an empty string if summarisation fails, in which case the raw
+    history is kept rather than lose context.
+    """
+    transcript = "\n\n".join(
+        f"{message['role'].upper()}: {message['content']}" for message in turns
+    )
+    try:
+        response = await client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": load_prompt("history_summary_prompt.txt")},
+                {"role": "user", "content": transcript},
+            ],
+            temperature=0.2,
+            max_tokens=400,
+            extra_body=OLLAMA_OPTIONS,
+        )
+        return (response.choices[0].message.content or "").strip()
+    except Exception:
+        return ""
+
+
+def _with_summary(messages: list[dict], summary: str) -> list[dict]:
+    """
+    Replace everything between the system prompt and the latest question
+    with a single summary message, so the prompt stays roughly constant in
+    size instead of growing every turn.
+    """
+    return [
+        messages[0],
+        {"role": "system", "content": f"Prior Q&A summary:\n{summary}"},
+        messages[-1],
+    ]
+
+
+def _extract_summary(text: str) -> tuple[str, dict | None]:
+    """
+    Pull the summary from between <summary>...</summary> tags, and the
+    game plan from between the ===PLAN=== / ===END PLAN=== delimiters.
+    """
+    plan = None
+    plan_start = text.find(_PLAN_START)
+    if plan_start != -1:
+        plan_end = text.find(_PLAN_END, plan_start)
+        if plan_end == -1:
+            plan_end = len(text)
+        # The plan is free text here, so tolerate code fences around the JSON
+        block = text[plan_start + len(_PLAN_START) : plan_end]
+        json_start = block.find("{")
+        json_end = block.rfind("}") + 1
+        try:
+            plan = planner.parse_json(block[json_start:json_end])
+        except ValueError:
+            plan = None
+        if plan is not None and not planner.is_complete(plan):
+            # Malformed, partial or mistyped plan — the orchestrator falls
+            # back to the planner rather than build from it
+            plan = None
+        # Keep the plan out of the summary fallback below
+        text = text[:plan_start]
+
     start = text.find("<summary>")
     end = text.find("</summary>")
     if start != -1 and end != -1:
-        return text[start + len("<summary>") : end].strip()
+        return text[start + len("<summary>") : end].strip(), plan
     # Fallback: return everything after the READY tag
-    idx = text.find(_READY_TAG)
-    return text[idx + len(_READY_TAG) :].strip()
+    idx = text.find(_READY_TAG, 0, _READY_WINDOW)
+    return text[idx + len(_READY_TAG) :].strip(), plan
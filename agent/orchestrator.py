@@ -5,19 +5,26 @@ Enforces strict phase ordering: Clarify → Plan → Execute.
 Each phase is a separate module with its own LLM system prompt.
 """
 
+from __future__ import annotations
+
+import asyncio
 import os
-from openai import OpenAI
+import sys
+from typing import TYPE_CHECKING
 from agent import clarifier, planner, builder
 
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
 
-
-def run(client: OpenAI, model: str, game_idea: str, output_dir: str) -> list[str]:
+async def arun(
+    client: AsyncOpenAI, model: str, game_idea: str, output_dir: str
+) -> list[str]:
     """
     Run the full agent pipeline: Clarify → Plan → Execute.
 
     Args:
-        client:     An initialised OpenAI client.
+        client:     An initialised AsyncOpenAI client.
         model:      The model name to use.
         game_idea:  The user's raw game idea.
         output_dir: Where to write the generated game files.
@@ -25,25 +32,44 @@ def run(client: OpenAI, model: str, game_idea: str, output_dir: str) -> list[str
     Returns:
         A list of created file paths.
     """
-    print("\n" + "🚀" * 20)
-    print("  AGENTIC GAME-BUILDER AI")
-    print("🚀" * 20)
-    print(f"\n📝  Game Idea: {game_idea}")
+    parts = [
+        "\n",
+        "🚀" * 20 + "\n",
+        "  AGENTIC GAME-BUILDER AI\n",
+        "🚀" * 20 + "\n",
+        f"\n📝  Game Idea: {game_idea}\n",
+    ]
+    sys.stdout.write("".join(parts))
 
     # ── Phase 1: Clarify ─────────────────────────────────────
-    requirements = clarifier.run(client, model, game_idea)
+    requirements, plan = await clarifier.arun(client, model, game_idea)
 
     # ── Phase 2: Plan ─────────────────────────────────────────
-    plan = planner.run(client, model, requirements)
+    # The clarifier's final turn usually carries the plan already;
+    # only pay for a separate planning round-trip when it does not.
+    if plan is None:
+        # Prefill the builder prompts while the planner is still decoding
+        warmup = asyncio.create_task(builder.awarm(client, model))
+        try:
+            plan = await planner.arun(client, model, requirements)
+        finally:
+            if not warmup.done():
+                warmup.cancel()  # never make the build wait on (or queue behind) it
+    else:
+        planner.print_overview(plan)
 
     # ── Phase 3: Build ────────────────────────────────────────
-    created_files = builder.run(client, model, plan, output_dir)
+    created_files = await builder.arun(client, model, plan, output_dir)
 
     # ── Done ──────────────────────────────────────────────────
-    print("\n" + "=" * 60)
-    print("🎉  ALL DONE!")
-    print("=" * 60)
-    print(f"Open {os.path.join(output_dir, 'index.html')} in your browser to play!")
-    print()
+    parts = [
+        "\n",
+        "=" * 60 + "\n",
+        "🎉  ALL DONE!\n",
+        "=" * 60 + "\n",
+        f"Open {os.path.join(output_dir, 'index.html')} in your browser to play!\n",
+        "\n",
+    ]
+    sys.stdout.write("".join(parts))
 
     return created_files
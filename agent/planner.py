@@ -2,28 +2,87 @@
 Phase 2 — Planner Agent
 
 Takes clarified requirements and produces a structured game plan in JSON.
+
+Each top-level plan field is exposed to the LLM as its own tool, so backends
+with parallel function calling can generate the fields as separate tool
+calls. If the tool calls do not cover every field with a value of the right
+shape, or the model does not support tools at all, the plan is requested
+again in JSON mode.
 """
 
+from __future__ import annotations
+
 import json
-import os
-from openai import OpenAI
+import sys
+from typing import TYPE_CHECKING
+from agent import OLLAMA_OPTIONS, load_prompt
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+
+def _strings(*keys: str) -> dict:
+    """JSON schema for an object whose given keys all hold strings."""
+    return {
+        "type": "object",
+        "properties": {key: {"type": "string"} for key in keys},
+        "required": list(keys),
+    }
+
+
+_STRING_LIST = {"type": "array", "items": {"type": "string"}}
+
+# JSON schema of each top-level field in the game plan
+_PLAN_FIELDS = {
+    "game_title": {"type": "string"},
+    "framework": {"type": "string", "enum": ["vanilla_js"]},
+    "mechanics": _STRING_LIST,
+    "controls": {
+        "type": "object",
+        "properties": {"description": {"type": "string"}, "keys": _STRING_LIST},
+        "required": ["description", "keys"],
+    },
+    "game_loop": _strings("init", "update", "render", "win_condition", "lose_condition"),
+    "visual_style": {"type": "string"},
+    "entities": _STRING_LIST,
+    "core_systems": _strings("input_handling", "rendering", "state_management"),
+    "file_structure": _strings("index.html", "style.css", "game.js"),
+}
+
+# One set_<field> tool per plan field
+_PLAN_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": f"set_{field}",
+            "description": f"Set the '{field}' field of the game plan.",
+            "parameters": {
+                "type": "object",
+                "properties": {field: schema},
+                "required": [field],
+            },
+        },
+    }
+    for field, schema in _PLAN_FIELDS.items()
+]
 
 
 def _load_system_prompt() -> str:
     """Load the planner system prompt from the prompts/ directory."""
-    prompt_path = os.path.join(
-        os.path.dirname(__file__), "..", "prompts", "planner_prompt.txt"
-    )
-    with open(prompt_path, "r", encoding="utf-8") as f:
-        return f.read().strip()
+    return load_prompt("planner_prompt.txt")
 
 
-def run(client: OpenAI, model: str, requirements: str) -> dict:
+async def arun(client: AsyncOpenAI, model: str, requirements: str) -> dict:
     """
     Generate a structured game plan from clarified requirements.
 
     Args:
-        client:       An initialised OpenAI client.
+        client:       An initialised AsyncOpenAI client.
         model:        The model name to use.
         requirements: The consolidated requirements summary from Phase 1.
 
@@ -32,60 +91,139 @@ def run(client: OpenAI, model: str, requirements: str) -> dict:
     """
     system_prompt = _load_system_prompt()
 
-    print("\n" + "=" * 60)
-    print("PHASE 2 — PLANNING")
-    print("=" * 60)
-    print("Generating a structured game plan...\n")
-
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {
-                "role": "user",
-                "content": f"Here are the clarified game requirements:\n\n{requirements}",
-            },
-        ],
-        temperature=0.4,
-    )
+    parts = [
+        "\n",
+        "=" * 60 + "\n",
+        "PHASE 2 — PLANNING\n",
+        "=" * 60 + "\n",
+        "Generating a structured game plan...\n\n",
+    ]
+    sys.stdout.write("".join(parts))
+
+    from openai import APIStatusError
+
+    system_message = {"role": "system", "content": system_prompt}
+    request = f"Here are the clarified game requirements:\n\n{requirements}"
+
+    # First ask for the plan as parallel set_<field> tool calls
+    try:
+        response = await client.chat.completions.create(
+            model=model,
+            messages=[
+                system_message,
+                {
+                    "role": "user",
+                    "content": f"{request}\n\nCall every set_* tool once, in parallel, "
+                    "with the matching part of the plan.",
+                },
+            ],
+            temperature=0.4,
+            max_tokens=1024,
+            tools=_PLAN_TOOLS,
+            tool_choice="required",
+            parallel_tool_calls=True,
+            extra_body=OLLAMA_OPTIONS,
+        )
+        tool_calls = response.choices[0].message.tool_calls or []
+    except APIStatusError:
+        # e.g. Ollama answers HTTP 400 "does not support tools" for models
+        # whose template has no tool calling; fall through to JSON mode
+        tool_calls = []
+    plan = _merge_tool_calls(tool_calls)
+
+    # Unless every plan field arrived through its tool, ask again in JSON mode.
+    # The two modes are never combined: a JSON-only output constraint blocks
+    # the markers some backends use to emit tool calls.
+    if not is_complete(plan):
+        response = await client.chat.completions.create(
+            model=model,
+            messages=[system_message, {"role": "user", "content": request}],
+            temperature=0.4,
+            max_tokens=1024,
+            # Answers must be bare JSON — no fences or prose to decode
+            response_format={"type": "json_object"},
+            extra_body=OLLAMA_OPTIONS,
+        )
+        plan = parse_json((response.choices[0].message.content or "").strip())
+
+    print_overview(plan)
+    return plan
 
-    raw = response.choices[0].message.content.strip()
 
-    # Try to parse JSON from the response
-    plan = _parse_json(raw)
+def print_overview(plan: dict) -> None:
+    """Print a short overview of a structured game plan."""
+    parts = [
+        "✅  Game plan created!\n",
+        "\n📋  Plan Overview:\n",
+        f"    Title:     {plan.get('game_title', 'Untitled')}\n",
+        f"    Framework: {plan.get('framework', 'vanilla_js')}\n",
+        f"    Mechanics: {', '.join(plan.get('mechanics', []))}\n",
+        f"    Controls:  {plan.get('controls', {}).get('description', 'N/A')}\n",
+        "\n",
+    ]
+    sys.stdout.write("".join(parts))
 
-    print("✅  Game plan created!")
-    print(f"\n📋  Plan Overview:")
-    print(f"    Title:     {plan.get('game_title', 'Untitled')}")
-    print(f"    Framework: {plan.get('framework', 'vanilla_js')}")
-    print(f"    Mechanics: {', '.join(plan.get('mechanics', []))}")
-    print(f"    Controls:  {plan.get('controls', {}).get('description', 'N/A')}")
-    print()
 
+def _merge_tool_calls(tool_calls: list) -> dict:
+    """
+    Merge the set_<field> tool calls into one plan dict.
+
+    Only the field named by each tool is taken from its arguments; calls to
+    unknown tools and malformed arguments are skipped.
+    """
+    plan = {}
+    for tool_call in tool_calls:
+        name = tool_call.function.name
+        field = name[len("set_") :] if name.startswith("set_") else None
+        if field not in _PLAN_FIELDS:
+            continue
+        try:
+            arguments = _json_loads(tool_call.function.arguments)
+        except ValueError:
+            continue  # skip a malformed call rather than lose the others
+        if isinstance(arguments, dict) and field in arguments:
+            plan[field] = arguments[field]
     return plan
 
 
-def _parse_json(text: str) -> dict:
+def is_complete(plan: dict) -> bool:
     """
-    Extract and parse JSON from the LLM response.
-    Handles cases where the JSON is wrapped in markdown code fences.
+    Check that a plan has every field in _PLAN_FIELDS, each of the shape its
+    schema describes: strings, lists of strings, and objects with all their
+    keys. Enum constraints are not enforced.
     """
-    # Strip markdown code fences if present
-    cleaned = text.strip()
-    if cleaned.startswith("```"):
-        # Remove first line (```json) and last line (```)
-        lines = cleaned.split("\n")
-        lines = lines[1:]  # remove opening fence
-        if lines and lines[-1].strip() == "```":
-            lines = lines[:-1]  # remove closing fence
-        cleaned = "\n".join(lines)
+    return all(
+        field in plan and _matches(plan[field], schema)
+        for field, schema in _PLAN_FIELDS.items()
+    )
+
 
+def _matches(value: object, schema: dict) -> bool:
+    """Check a value against one of the JSON schemas in _PLAN_FIELDS."""
+    kind = schema["type"]
+    if kind == "string":
+        return isinstance(value, str)
+    if kind == "array":
+        return isinstance(value, list) and all(_matches(item, schema["items"]) for item in value)
+    return isinstance(value, dict) and all(
+        key in value and _matches(value[key], sub_schema)
+        for key, sub_schema in schema["properties"].items()
+    )
+
+
+def _json_loads(text: str) -> object:
+    """Parse JSON text, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def parse_json(text: str) -> dict:
+    """Parse a JSON game plan, which must be a JSON object."""
     try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError:
-        # Last resort: try to find JSON between { and }
-        start = text.find("{")
-        end = text.rfind("}") + 1
-        if start != -1 and end > start:
-            return json.loads(text[start:end])
-        raise ValueError(f"Could not parse JSON from LLM response:\n{text}")
+        plan = _json_loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Could not parse JSON from LLM response:\n{text}") from e
+    if not isinstance(plan, dict):
+        raise ValueError(f"Expected a JSON object in LLM response:\n{text}")
+    return plan
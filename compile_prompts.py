@@ -0,0 +1,45 @@
+"""
+compile_prompts.py — Precompile the system prompts for installed copies.
+
+Bundles every prompts/*.txt file into prompts/_compiled.py as string
+literals, so the agents import their prompts from one module instead of
+opening and decoding each text file. The Dockerfile runs it at build time.
+
+Usage:
+    python compile_prompts.py
+
+Each entry records the modification time of its source file; an entry whose
+.txt file has changed since is ignored and the file is read directly, so
+editing a prompt never requires re-running this script.
+"""
+
+import os
+
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+OUTPUT_PATH = os.path.join(PROMPTS_DIR, "_compiled.py")
+
+
+def main():
+    prompts = {}
+    for name in sorted(os.listdir(PROMPTS_DIR)):
+        if name.endswith(".txt"):
+            path = os.path.join(PROMPTS_DIR, name)
+            with open(path, "r", encoding="utf-8") as f:
+                prompts[name] = (os.stat(path).st_mtime_ns, f.read().strip())
+
+    lines = [
+        "# Generated by compile_prompts.py from prompts/*.txt — do not edit by hand.",
+        "# Maps each file name to (source mtime in ns, stripped prompt text).",
+        "",
+        "PROMPTS = {",
+    ]
+    lines += [f"    {name!r}: {entry!r}," for name, entry in prompts.items()]
+    lines += ["}", ""]
+
+    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+    print(f"Compiled {len(prompts)} prompts into {OUTPUT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,41 +10,85 @@ Usage:
     python main.py --model qwen2.5-coder:7b
 """
 
+from __future__ import annotations
+
 import argparse
+import asyncio
+import json
 import os
 import sys
+import tempfile
+import time
+from typing import TYPE_CHECKING
+
+# openai, dotenv and the agent package are imported lazily inside main()
+# and _run(), so --help and argument errors don't pay for loading them.
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
 
-from dotenv import load_dotenv
-from openai import OpenAI
+# Recently seen Ollama model list, so back-to-back runs skip the HTTP check
+_MODELS_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "agentic-game-builder", "models.json"
+)
+_MODELS_CACHE_TTL = 60  # seconds
 
-from agent import orchestrator
 
+def _load_cached_models(base_url: str) -> list[str] | None:
+    """Return the cached model list for base_url, or None if missing or stale."""
+    try:
+        if time.time() - os.path.getmtime(_MODELS_CACHE_PATH) >= _MODELS_CACHE_TTL:
+            return None
+        with open(_MODELS_CACHE_PATH, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get("base_url") != base_url:
+        return None
+    models = cached.get("models")
+    if not isinstance(models, list) or not all(isinstance(m, str) for m in models):
+        return None
+    return models
+
+
+def _save_cached_models(base_url: str, models: list[str]) -> None:
+    """Atomically write the model list to the cache file. Failures are ignored."""
+    cache_dir = os.path.dirname(_MODELS_CACHE_PATH)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"base_url": base_url, "models": models}, f)
+        os.replace(tmp_path, _MODELS_CACHE_PATH)
+    except OSError:
+        pass
 
-def _check_ollama(client: OpenAI, base_url: str) -> None:
+
+async def _check_ollama(client: AsyncOpenAI, base_url: str, model: str) -> list[str]:
     """
     Verify that the Ollama server is reachable and the requested model is available.
     Exits with a helpful message if either check fails.
     """
+    # Only trust the cache when it confirms the model, so a model pulled
+    # right after a failed check is picked up on the next run
+    available = _load_cached_models(base_url)
+    if available is not None and model in set(available):
+        return available
+
     try:
-        models = client.models.list()
+        models = await client.models.list()
         available = [m.id for m in models.data]
     except Exception as e:
         print(f"\n❌  Cannot reach Ollama at: {base_url}")
         print("    Make sure Ollama is running:  ollama serve")
         print(f"    Error: {e}")
         sys.exit(1)
+
+    _save_cached_models(base_url, available)
     return available
 
 
 def main():
-    # ── Load .env first — all config lives there ──────────────
-    load_dotenv()
-
-    # ── Read config from environment (set in .env) ─────────────
-    ollama_base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/v1")
-    api_key         = os.getenv("OLLAMA_API_KEY", "ollama")
-    env_model       = os.getenv("LLM_MODEL")          # No hardcoded fallback
-
     # ── CLI arguments (override .env values if provided) ───────
     parser = argparse.ArgumentParser(
         description="Agentic Game-Builder AI — generate playable HTML games from ideas"
@@ -69,6 +113,16 @@ def main():
     )
     args = parser.parse_args()
 
+    # ── Load .env — all config lives there ─────────────────────
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    # ── Read config from environment (set in .env) ─────────────
+    ollama_base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/v1")
+    api_key         = os.getenv("OLLAMA_API_KEY", "ollama")
+    env_model       = os.getenv("LLM_MODEL")          # No hardcoded fallback
+
     # CLI --model flag takes priority; fall back to .env LLM_MODEL
     model = args.model or env_model
 
@@ -80,32 +134,56 @@ def main():
         print("    Or pass it via CLI:  python main.py --model qwen2.5-coder:7b")
         sys.exit(1)
 
-    # ── Create OpenAI-compatible client pointing at Ollama ─────
-    client = OpenAI(base_url=ollama_base_url, api_key=api_key)
-
-    # ── Validate Ollama is reachable and model is pulled ───────
-    available_models = _check_ollama(client, ollama_base_url)
-    if model not in available_models:
-        print(f"\n❌  Model '{model}' is not available in Ollama.")
-        print(f"    Pull it first:  ollama pull {model}")
-        print(f"    Available models: {', '.join(available_models) or 'none'}")
-        sys.exit(1)
+    # ── Run everything that talks to Ollama on one event loop ──
+    asyncio.run(_run(args, model, ollama_base_url, api_key))
 
-    # ── Get game idea ───────────────────────────────────────────
-    game_idea = args.idea
-    if not game_idea:
-        print("\n🎮  Welcome to the Agentic Game-Builder AI!")
-        print("─" * 50)
-        print(f"   Model  : {model}")
-        print(f"   Backend: {ollama_base_url}")
-        print("─" * 50)
-        game_idea = input("Enter your game idea: ").strip()
-        if not game_idea:
-            print("❌  Error: No game idea provided.")
+
+async def _run(
+    args: argparse.Namespace, model: str, ollama_base_url: str, api_key: str
+) -> None:
+    """Validate the backend, collect the game idea and run the async pipeline."""
+    import httpx
+    from openai import AsyncOpenAI
+
+    from agent import orchestrator
+
+    # ── One pooled HTTP client shared by every phase ───────────
+    # Keep-alive connections are reused across phases, and HTTP/2
+    # multiplexes the concurrent builder requests when the backend speaks it.
+    http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=16, max_keepalive_connections=16),
+        timeout=600,
+    )
+
+    # ── Create OpenAI-compatible client pointing at Ollama ─────
+    async with AsyncOpenAI(
+        base_url=ollama_base_url, api_key=api_key, http_client=http_client
+    ) as client:
+
+        # ── Validate Ollama is reachable and model is pulled ───
+        available_models = await _check_ollama(client, ollama_base_url, model)
+        if model not in set(available_models):
+            print(f"\n❌  Model '{model}' is not available in Ollama.")
+            print(f"    Pull it first:  ollama pull {model}")
+            print(f"    Available models: {', '.join(available_models) or 'none'}")
             sys.exit(1)
 
-    # ── Run the agent pipeline ─────────────────────────────────
-    orchestrator.run(client, model, game_idea, args.output)
+        # ── Get game idea ───────────────────────────────────────
+        game_idea = args.idea
+        if not game_idea:
+            print("\n🎮  Welcome to the Agentic Game-Builder AI!")
+            print("─" * 50)
+            print(f"   Model  : {model}")
+            print(f"   Backend: {ollama_base_url}")
+            print("─" * 50)
+            game_idea = input("Enter your game idea: ").strip()
+            if not game_idea:
+                print("❌  Error: No game idea provided.")
+                sys.exit(1)
+
+        # ── Run the agent pipeline ─────────────────────────────
+        await orchestrator.arun(client, model, game_idea, args.output)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,108 @@
+"""Tests for the builder's streaming file splitter."""
+
+import os
+import random
+import tempfile
+import unittest
+
+from agent.builder import _StreamingFileWriter, _parse_files
+
+RESPONSE = """Sure! Here are the files.
+
+===FILE: index.html===
+<!DOCTYPE html>
+<html>
+  <head><link rel="stylesheet" href="style.css"></head>
+  <body><canvas id="game"></canvas><script src="game.js"></script></body>
+</html>
+===END FILE===
+
+===FILE: style.css===
+
+body { margin: 0; background: #000; }
+/* === not a delimiter === */
+===END FILE===
+===FILE: game.js===
+const canvas = document.getElementById("game");
+let banner = "=== END ===";   // looks like, but is not, a delimiter
+function loop() { requestAnimationFrame(loop); }
+loop();
+
+===END FILE===
+Enjoy your game!
+"""
+
+
+def _chunks(text: str, rng: random.Random) -> list[str]:
+    """Split text into randomly sized chunks, as a token stream would."""
+    chunks = []
+    i = 0
+    while i < len(text):
+        size = rng.randint(1, 20)
+        chunks.append(text[i : i + size])
+        i += size
+    return chunks
+
+
+def _read(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+class StreamingFileWriterTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.output_dir = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _stream(self, chunks: list[str]) -> _StreamingFileWriter:
+        writer = _StreamingFileWriter(self.output_dir)
+        try:
+            for chunk in chunks:
+                writer.feed(chunk)
+        finally:
+            writer.close()
+        return writer
+
+    def test_random_chunking_matches_parse_files(self):
+        expected = _parse_files(RESPONSE.strip())
+        for seed in range(200):
+            with self.subTest(seed=seed):
+                writer = self._stream(_chunks(RESPONSE, random.Random(seed)))
+                self.assertEqual(writer.written.keys(), expected.keys())
+                for name, content in expected.items():
+                    self.assertEqual(_read(writer.written[name]), content)
+                self.assertEqual(sorted(os.listdir(self.output_dir)), sorted(expected))
+
+    def test_single_character_chunks_match_parse_files(self):
+        writer = self._stream(list(RESPONSE))
+        for name, content in _parse_files(RESPONSE.strip()).items():
+            self.assertEqual(_read(writer.written[name]), content)
+
+    def test_truncated_response_keeps_existing_file(self):
+        game_js = os.path.join(self.output_dir, "game.js")
+        with open(game_js, "w", encoding="utf-8") as f:
+            f.write("// previous good build\n")
+
+        cut = RESPONSE.index("function loop")
+        for seed in range(20):
+            with self.subTest(seed=seed):
+                writer = self._stream(_chunks(RESPONSE[:cut], random.Random(seed)))
+                self.assertEqual(set(writer.written), {"index.html", "style.css"})
+                self.assertEqual(_read(game_js), "// previous good build\n")
+                self.assertEqual(
+                    sorted(os.listdir(self.output_dir)), ["game.js", "index.html", "style.css"]
+                )
+                with self.assertRaises(ValueError):
+                    _parse_files(RESPONSE[:cut].strip())
+
+    def test_truncated_header_writes_nothing(self):
+        writer = self._stream(["===FILE: index.ht"])
+        self.assertEqual(writer.written, {})
+        self.assertEqual(os.listdir(self.output_dir), [])
+
+
+if __name__ == "__main__":
+    unittest.main()